@@ -0,0 +1,78 @@
+"""Disk cache of wallhaven collection ids, so a download doesn't look up the collection by its name every time.
+
+The cache is only an optimization: any cache error is ignored and the id is looked up via the API.
+All functions do blocking file IO, run them in a thread from async code.
+"""
+
+import hashlib
+import os
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Final
+
+import platformdirs
+
+#: Default directory of the cache files.
+CACHE_DIR: Final[Path] = Path(platformdirs.user_cache_dir('haven'))
+
+#: How long a cached collection id is used instead of looking it up via the API (in seconds).
+COLLECTION_ID_CACHE_TTL: Final[int] = 24 * 60 * 60
+
+#: Size of the hash used as a cache file name (in bytes).
+CACHE_KEY_SIZE: Final[int] = 16
+
+
+def load_collection_id(cache_dir: Path, user_name: str, collection_name: str) -> int | None:
+    """Load a collection id from the cache.
+
+    Arguments:
+        cache_dir (Path): cache directory.
+        user_name (str): wallhaven user name.
+        collection_name (str): collection name.
+
+    Returns:
+        int | None: collection id or None if it isn't cached, the cache is expired or broken.
+    """
+    cache_path = _get_cache_path(cache_dir, user_name, collection_name)
+    with suppress(OSError, ValueError):
+        if time.time() - cache_path.stat().st_mtime <= COLLECTION_ID_CACHE_TTL:
+            return int(cache_path.read_text())
+    return None
+
+
+def save_collection_id(cache_dir: Path, user_name: str, collection_name: str, collection_id: int):
+    """Save a collection id to the cache.
+
+    The id is written to a temporary file first, so concurrent runs never read a partially written file.
+
+    Arguments:
+        cache_dir (Path): cache directory.
+        user_name (str): wallhaven user name.
+        collection_name (str): collection name.
+        collection_id (int): collection id.
+    """
+    cache_path = _get_cache_path(cache_dir, user_name, collection_name)
+    with suppress(OSError):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        tmp_path = cache_path.with_name(f'{cache_path.name}.{pid}.tmp')
+        tmp_path.write_text(str(collection_id))
+        os.replace(tmp_path, cache_path)
+
+
+def drop_collection_id(cache_dir: Path, user_name: str, collection_name: str):
+    """Remove a collection id from the cache.
+
+    Arguments:
+        cache_dir (Path): cache directory.
+        user_name (str): wallhaven user name.
+        collection_name (str): collection name.
+    """
+    with suppress(OSError):
+        _get_cache_path(cache_dir, user_name, collection_name).unlink(missing_ok=True)
+
+
+def _get_cache_path(cache_dir: Path, user_name: str, collection_name: str) -> Path:
+    cache_key = f'{user_name}:{collection_name}'.encode()
+    return cache_dir / hashlib.blake2b(cache_key, digest_size=CACHE_KEY_SIZE).hexdigest()
@@ -1,11 +1,9 @@
 """Cli interface for Haven."""
 
-import asyncio
+from typing import Any, Coroutine
 
 import click
 
-from haven.downloader import HavenDownloader
-
 
 @click.group()
 def cli():
@@ -29,11 +27,29 @@ def cli():
 @click.option('--apikey', help='wallhaven.cc API key')
 def download(username: str, collection: str, output: str, apikey: str | None):
     """Download a image collection."""
+    # imported here so `--help` doesn't pay for loading httpx, aiohttp and rich
+    from haven.downloader import HavenDownloader  # noqa: WPS433 Found nested import
+
     downloader = HavenDownloader(apikey)
-    asyncio.run(
+    _run(
         downloader.download(
             username,
             collection,
             output,
         ),
     )
+
+
+def _run(coro: Coroutine[Any, Any, None]):
+    """Run a coroutine on uvloop if it is installed (`haven[uvloop]`), on asyncio otherwise.
+
+    Arguments:
+        coro (Coroutine): coroutine to run.
+    """
+    try:
+        import uvloop  # noqa: WPS433 Found nested import
+    except ImportError:
+        import asyncio  # noqa: WPS433
+        asyncio.run(coro)
+    else:
+        uvloop.run(coro)
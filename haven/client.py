@@ -1,18 +1,162 @@
 """Core python interface for the wallhaven.cc (https://wallhaven.cc) API."""
 from __future__ import annotations
 
-from typing import Any, Union, cast
+import asyncio
+import dataclasses
+from types import MappingProxyType
+from typing import Any, Callable, Final, TypeVar
+from urllib.parse import quote, urlencode
 
+import msgspec
 from httpx import AsyncClient, Response
-from yarl import URL
 
 from haven import errors
 from haven.entities import Collection, UserSettings, Wallpapper
-from haven.search_filters import SearchParams
+from haven.search_filters import FLAG_BITS, SearchParams
 
-JsonObjType = dict[str, Union['JsonType', int, str]]
-JsonObjListType = list[JsonObjType]
-JsonType = JsonObjType | list['JsonType']
+_DataType = TypeVar('_DataType')
+
+
+class _PageMeta(msgspec.Struct):
+    """Pagination info of a paginated wallhaven API response."""
+
+    last_page: int = 1
+
+
+class _Envelope(msgspec.Struct):
+    """wallhaven API response, `data` is left undecoded until its type is known."""
+
+    data: msgspec.Raw = msgspec.Raw()  # noqa: WPS110 Found wrong variable name, it's the API field name
+    meta: _PageMeta | None = None
+    error: str | None = None
+
+
+_envelope_decoder: Final = msgspec.json.Decoder(_Envelope)
+_collections_decoder: Final = msgspec.json.Decoder(list[Collection])
+_wallpapers_decoder: Final = msgspec.json.Decoder(list[Wallpapper])
+_user_settings_decoder: Final = msgspec.json.Decoder(UserSettings)
+#: `data` field value treated like a missing `data` field.
+_NULL_DATA: Final = msgspec.Raw(b'null')
+
+#: Maximum number of collection pages fetched at once, wallhaven allows about 45 API requests per minute.
+PARALLEL_PAGE_REQUESTS: Final = 3
+
+#: Error message of a response without an error description, formatted with the response.
+_UNEXPECTED_RESPONSE: Final = 'Unexpected response: {0.status_code} {0.reason_phrase}'
+
+#: SearchParams fields sent as separate search query parameters (field name -> query parameter).
+#: All other fields are joined into the `q` parameter.
+SEARCH_QUERY_PARAMS: Final = MappingProxyType({
+    'categories': 'categories',
+    'purity': 'purity',
+    'sorting': 'sorting',
+    'order': 'order',
+    'top_range': 'topRange',
+    'atleast': 'atleast',
+    'resolutions': 'resolutions',
+    'ratios': 'ratios',
+    'colors': 'colors',
+})
+
+#: SearchParams flag fields, sent as 3-bit binary strings (like 010).
+SEARCH_FLAG_FIELDS: Final = frozenset(('categories', 'purity'))
+
+
+def _compile_query_builder() -> Callable[[HavenClient, SearchParams], dict[str, Any]]:
+    """Generate the search query params builder specialized for SearchParams fields.
+
+    The builder is compiled once on import, so `find_wallpapers` doesn't look up
+    the field mapping for every call.
+
+    Returns:
+        Callable: a function to be used as the `HavenClient._build_query_dict` method.
+    """
+    lines = [
+        'def _build_query_dict(self, filters):',
+        '    query_params = dict()',
+        '    value = self._build_query_param(filters)',
+        '    if value:',
+        "        query_params['q'] = value",
+    ]
+    for field in dataclasses.fields(SearchParams):
+        param_name = SEARCH_QUERY_PARAMS.get(field.name)
+        if param_name is None:
+            continue
+        param_value = 'FLAG_BITS[value]' if field.name in SEARCH_FLAG_FIELDS else 'value'
+        lines.extend((
+            f'    value = filters.{field.name}',
+            '    if value:',
+            f'        query_params[{param_name!r}] = {param_value}',
+        ))
+    lines.append('    return query_params')
+
+    namespace: dict[str, Any] = {'FLAG_BITS': FLAG_BITS}
+    # the code is built only from the constants above
+    code = compile('\n'.join(lines), '<haven search query builder>', 'exec')  # noqa: WPS421 Found wrong function call
+    exec(code, namespace)  # noqa: S102, WPS421
+    return namespace['_build_query_dict']
+
+
+def _decode(resp: Response, decoder: msgspec.json.Decoder[_DataType], payload: bytes) -> _DataType:
+    """Decode a response payload.
+
+    Arguments:
+        resp(Response): The web response the payload belongs to.
+        decoder(msgspec.json.Decoder): The decoder of the payload type.
+        payload(bytes): The payload to decode.
+
+    Returns:
+        The decoded payload.
+
+    Raises:
+        ClientRequestError: If the payload isn't valid JSON of the decoder type (e.g. an HTML error page).
+    """
+    try:
+        return decoder.decode(payload)
+    except msgspec.DecodeError as exc:
+        raise errors.ClientRequestError(resp, _UNEXPECTED_RESPONSE.format(resp)) from exc
+
+
+def _decode_response(resp: Response, decoder: msgspec.json.Decoder[_DataType]) -> tuple[_DataType, int]:
+    """Get the data and the number of pages from a response.
+
+    Arguments:
+        resp(Response): The web response to get the data from.
+        decoder(msgspec.json.Decoder): The decoder of the response data type.
+
+    Returns:
+        The data from the response (or the whole response if its `data` field is missing or null)
+        and the last page number (1 if the response isn't paginated).
+
+    Raises:
+        ClientRequestError: If the response is not Ok.
+    """
+    envelope = _decode(resp, _envelope_decoder, resp.content)
+    if envelope.error is not None:
+        raise errors.ClientRequestError(resp, envelope.error)
+    if resp.is_error:
+        raise errors.ClientRequestError(resp, _UNEXPECTED_RESPONSE.format(resp))
+
+    last_page = envelope.meta.last_page if envelope.meta else 1
+    if not envelope.data or envelope.data == _NULL_DATA:
+        return _decode(resp, decoder, resp.content), last_page
+    return _decode(resp, decoder, envelope.data), last_page
+
+
+async def _get_page(http_client: AsyncClient, semaphore: asyncio.Semaphore, url: str, page: int) -> Response:
+    """Get a page of a paginated response.
+
+    Arguments:
+        http_client(AsyncClient): An AsyncClient instance.
+        semaphore(asyncio.Semaphore): The limit of concurrent page requests.
+        url(str): The paginated resource URL.
+        page(int): The page number.
+
+    Returns:
+        Response: The page response.
+    """
+    async with semaphore:
+        return await http_client.get(url, params={'page': page})
 
 
 class HavenClient():
@@ -42,9 +186,16 @@ class HavenClient():
             apikey(str): Your wallhaven.cc API key.
             apihost(str): The wallhaven.cc API host. Default to 'https://wallhaven.cc'.
         """
-        self.apiurl = URL(apihost) / 'api/v1'
+        apihost = apihost.rstrip('/')
+        self.apiurl = f'{apihost}/api/v1'
         self.apikey = apikey
 
+        self._collections_url = f'{self.apiurl}/collections'
+        self._user_collections_url = f'{self._collections_url}/{{username}}'
+        self._collection_url = f'{self._user_collections_url}/{{id_}}'
+        self._search_url = f'{self.apiurl}/search'
+        self._settings_url = f'{self.apiurl}/settings'
+
         self._client = http_client
         if apikey:
             self._client.headers['X-API-Key'] = apikey
@@ -65,27 +216,39 @@ class HavenClient():
         if not username and not self.apikey:
             raise errors.UserOrApikeyNotSetError()
 
-        url = self.apiurl / 'collections'
+        url = self._collections_url
         if username:
-            url /= username
+            url = self._user_collections_url.format(username=quote(username, safe=''))
 
-        resp = await self._client.get(str(url))
-        return cast(list[Collection], self._get_resp_data(resp))
+        resp = await self._client.get(url)
+        return self._get_resp_data(resp, _collections_decoder)
 
     async def get_wallpapper_list(self, username: str, id_: int) -> list[Wallpapper]:
         """Get an image collection.
 
+        All pages of the collection are fetched, pages after the first one concurrently
+        (`PARALLEL_PAGE_REQUESTS` at a time, to stay within the API rate limit).
+
         Arguments:
             username(str): The username of the user.
             id_(int): The id of the collection.
 
         Returns:
-            Collection: The image collection data.
+            list[Wallpapper]: The wallpapers of the collection.
         """
-        url = self.apiurl / f'collections/{username}/{id_}'
+        url = self._collection_url.format(username=quote(username, safe=''), id_=id_)
+
+        resp = await self._client.get(url)
+        wallpapers, last_page = _decode_response(resp, _wallpapers_decoder)
 
-        resp = await self._client.get(str(url))
-        return cast(list[Wallpapper], self._get_resp_data(resp))
+        semaphore = asyncio.Semaphore(PARALLEL_PAGE_REQUESTS)
+        page_responses = await asyncio.gather(*(
+            _get_page(self._client, semaphore, url, page)
+            for page in range(2, last_page + 1)
+        ))
+        for page_resp in page_responses:
+            wallpapers.extend(self._get_resp_data(page_resp, _wallpapers_decoder))
+        return wallpapers
 
     async def find_wallpapers(self, filters: SearchParams) -> list[Wallpapper]:
         """Find wallpapers using the filters.
@@ -96,43 +259,12 @@ class HavenClient():
         Returns:
             list[Wallpapper]: A list of wallpapers.
         """
-        query_params = {}
-
-        q_values = self._build_query_param(filters)
-        if q_values:
-            query_params['q'] = q_values
-
-        if filters.categories:
-            query_params['categories'] = f'{filters.categories:03b}'  # 3-bit binary (like 010)
-
-        if filters.purity:
-            query_params['purity'] = f'{filters.purity:03b}'
-
-        if filters.sorting:
-            query_params['sorting'] = filters.sorting
-
-        if filters.order:
-            query_params['order'] = filters.order
-
-        if filters.top_range:
-            query_params['topRange'] = filters.top_range
+        query_params = self._build_query_dict(filters)
+        query_string = urlencode(query_params, doseq=True)
+        url = f'{self._search_url}?{query_string}'
 
-        if filters.atleast:
-            query_params['atleast'] = filters.atleast
-
-        if filters.resolutions:
-            query_params['resolutions'] = filters.resolutions
-
-        if filters.ratios:
-            query_params['ratios'] = filters.ratios
-
-        if filters.colors:
-            query_params['colors'] = filters.colors
-
-        url = self.apiurl / 'search' % query_params
-
-        resp = await self._client.get(str(url))
-        return cast(list[Wallpapper], self._get_resp_data(resp))
+        resp = await self._client.get(url)
+        return self._get_resp_data(resp, _wallpapers_decoder)
 
     async def get_user_settings(self) -> UserSettings:
         """Get the user settings.
@@ -146,9 +278,10 @@ class HavenClient():
         if not self.apikey:
             raise errors.ApikeyNotSetError
 
-        url = self.apiurl / 'settings'
-        resp = await self._client.get(str(url))
-        return cast(UserSettings, self._get_resp_data(resp))
+        resp = await self._client.get(self._settings_url)
+        return self._get_resp_data(resp, _user_settings_decoder)
+
+    _build_query_dict = _compile_query_builder()
 
     def _build_query_param(self, filters: SearchParams) -> str | None:
         query_parts = []
@@ -175,30 +308,15 @@ class HavenClient():
             return None
         return ' '.join(query_parts)
 
-    def _get_resp_data(self, resp: Response) -> JsonType:
+    def _get_resp_data(self, resp: Response, decoder: msgspec.json.Decoder[_DataType]) -> _DataType:
         """Get the data from a response.
 
         Arguments:
             resp(Response): The web response to get the data from.
+            decoder(msgspec.json.Decoder): The decoder of the response data type.
 
         Returns:
-            JsonType: The data from the response or an error message.
-
-        Raises:
-            ClientRequestError: If the response is not Ok.
+            The data from the response (or the whole response if its `data` field is missing or null).
         """
-        json_resp: dict[str, Any] = resp.json()
-
-        resp_data = json_resp.get('data')
-        if resp_data is not None:
-            return resp_data
-
-        if isinstance(resp_data, str):
-            raise errors.ClientRequestError(resp, resp_data)
-
-        # Ignore `Found implicit `.get()` dict usage` because I want to be
-        # confident that 'error' field exists or not
-        if 'error' in json_resp:
-            raise errors.ClientRequestError(resp, json_resp['error'])  # noqa:WPS529
-
-        return json_resp
+        resp_data, _ = _decode_response(resp, decoder)
+        return resp_data
@@ -1,19 +1,47 @@
 """Set of file downloader functions and classes."""
 
 import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, ExitStack, suppress
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Final, cast
+from typing import Any, Callable, Coroutine, Final, TypeVar
 
+import aiohttp
 import httpx
-from rich.progress import Progress
-from rich.progress import TaskID as ProgressTaskID
+from rich.progress import Progress, TaskID
 
+from haven import cache, entities, errors
 from haven.client import HavenClient
 
+_ResultType = TypeVar('_ResultType')
+
 #: Base reqest timeout before downloader will raise an exception.
 REQUEST_TIMEOUT: Final[int] = 10
 
+#: How long idle keep-alive connections are kept open (in seconds).
+KEEPALIVE_EXPIRY: Final[int] = 30
+
+#: How long resolved CDN host addresses are kept in the connector cache (in seconds).
+DNS_CACHE_TTL: Final[int] = 300
+
+#: Size of a single chunk read from a file download stream (in bytes).
+CHUNK_SIZE: Final[int] = 256 * 1024  # noqa: WPS432 Found magic number
+
+#: How often progress bars are redrawn while files are downloading (in seconds).
+PROGRESS_REFRESH_INTERVAL: Final[float] = 0.1
+
+#: How long a progress bar of a downloaded file stays on screen with a check mark (in seconds).
+FINISHED_PROGRESS_DELAY: Final[float] = 0.5
+
+#: Flags and mode of a downloaded image file.
+FILE_OPEN_FLAGS: Final[int] = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+FILE_MODE: Final[int] = 0o644
+
+#: posix_fadvise (and fdatasync) isn't available on every platform, e.g. on Windows.
+HAS_FADVISE: Final[bool] = hasattr(os, 'posix_fadvise')  # noqa: WPS421 Found wrong function call
+
 
 @dataclass
 class FileData():
@@ -24,19 +52,291 @@ class FileData():
     url: str
 
 
+@dataclass
+class _ProgressCounter():
+    """Downloaded bytes of a single file which aren't shown on progress bars yet."""
+
+    task_id: TaskID
+    pending: int = 0
+    #: Event loop time after which the progress bar of a downloaded file is hidden.
+    hide_at: float | None = None
+
+    def is_expired(self, now: float | None) -> bool:
+        """Check if the progress bar should be hidden.
+
+        Arguments:
+            now (float | None): current event loop time, None to hide any progress bar.
+
+        Returns:
+            bool: True if the progress bar should be hidden.
+        """
+        if now is None:
+            return True
+        return self.hide_at is not None and self.hide_at <= now
+
+
+class _DownloadProgress():
+    """Progress bars of downloading files, redrawn periodically instead of on every chunk.
+
+    Used as an async context manager: shows the progress bars and redraws them until exit.
+    """
+
+    def __init__(self, total_size: int):
+        """Initialize _DownloadProgress.
+
+        Arguments:
+            total_size (int): size of all downloading files.
+        """
+        self._progress = Progress()
+        self._total_task = self._progress.add_task(description='Total', total=total_size)
+        self._counters: list[_ProgressCounter] = []
+        self._refresher: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> '_DownloadProgress':
+        """Show progress bars and start redrawing them.
+
+        Returns:
+            _DownloadProgress: self.
+        """
+        self._progress.start()
+        self._refresher = asyncio.create_task(self._refresh())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Stop redrawing, show the final state and remove progress bars from the screen.
+
+        Arguments:
+            exc_info: exception info, if the block raised one.
+        """
+        if self._refresher:
+            self._refresher.cancel()
+        self._counters = self._flush(now=None)
+        self._progress.stop()
+
+    def add_file(self, name: str, size: int) -> _ProgressCounter:
+        """Add a progress bar of a downloading file.
+
+        Arguments:
+            name (str): file name.
+            size (int): file size.
+
+        Returns:
+            _ProgressCounter: counter of the file downloaded bytes.
+        """
+        counter = _ProgressCounter(self._progress.add_task(name, total=size))
+        self._counters.append(counter)
+        return counter
+
+    def finish_file(self, counter: _ProgressCounter, name: str):
+        """Mark a file as downloaded.
+
+        The check mark is shown for a while and then hidden by the periodic redraw,
+        so a download worker doesn't wait for it.
+
+        Arguments:
+            counter (_ProgressCounter): counter of the file downloaded bytes.
+            name (str): file name.
+        """
+        self._progress.update(counter.task_id, description=f':white_check_mark: {name}')
+        counter.hide_at = asyncio.get_running_loop().time() + FINISHED_PROGRESS_DELAY
+
+    async def _refresh(self):
+        """Periodically show downloaded bytes on progress bars until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:  # noqa: WPS457 Found an infinite while loop
+            await asyncio.sleep(PROGRESS_REFRESH_INTERVAL)
+            self._counters = self._flush(now=loop.time())
+
+    def _flush(self, now: float | None) -> list[_ProgressCounter]:
+        """Move pending bytes of the counters to progress bars and hide finished ones.
+
+        Arguments:
+            now (float | None): current event loop time, None to hide all progress bars.
+
+        Returns:
+            list[_ProgressCounter]: counters which progress bars are still shown.
+        """
+        total_delta = 0
+        active_counters = []
+        for counter in self._counters:
+            if counter.pending:
+                self._progress.advance(counter.task_id, counter.pending)
+                total_delta += counter.pending
+                counter.pending = 0
+
+            if counter.is_expired(now):
+                self._progress.update(counter.task_id, visible=False)
+            else:
+                active_counters.append(counter)
+
+        if total_delta:
+            self._progress.advance(self._total_task, total_delta)
+        return active_counters
+
+
+def _write_all(fd: int, chunk: bytes):
+    """Write the whole chunk to a file, `os.write` may write only a part of it.
+
+    Arguments:
+        fd (int): file descriptor of the downloaded file.
+        chunk (bytes): downloaded data.
+    """
+    view = memoryview(chunk)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class _FileWriter():
+    """Writer of a downloaded file, blocking file IO runs in the executor so it doesn't stall the event loop.
+
+    Used as an async context manager: the file is opened on enter and closed on exit.
+    If the block fails or is cancelled, the partially written file is removed.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, filepath: Path):
+        """Initialize _FileWriter.
+
+        Arguments:
+            executor (ThreadPoolExecutor): executor for blocking file IO.
+            filepath (Path): path of the downloaded file.
+        """
+        self._executor = executor
+        self._filepath = filepath
+        self._fd = -1
+        self._pending_io: asyncio.Future[Any] | None = None
+
+    async def __aenter__(self) -> '_FileWriter':
+        """Open the file.
+
+        Returns:
+            _FileWriter: self.
+
+        Raises:
+            asyncio.CancelledError: if cancelled, the file is removed.
+        """
+        try:
+            await self._run(self._open)
+        except asyncio.CancelledError:
+            # the executor thread opens the file anyway
+            await self._run(self._close, True)  # noqa: WPS425 run_in_executor takes no keyword arguments
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        """Close the file, remove it if it isn't written completely.
+
+        Arguments:
+            exc_type: exception type, if the block raised one.
+            exc_value: exception, if the block raised one.
+            traceback: exception traceback, if the block raised one.
+        """
+        await self._run(self._close, exc_type is not None)
+
+    async def write(self, chunk: bytes):
+        """Write a chunk of the downloaded data.
+
+        Arguments:
+            chunk (bytes): downloaded data.
+        """
+        await self._run(_write_all, self._fd, chunk)
+
+    async def _run(self, func: Callable[..., _ResultType], *args: Any) -> _ResultType:
+        """Run file IO in the executor once the previous file IO is finished.
+
+        Cancelling the caller doesn't stop the executor thread, so the IO is shielded and
+        the next one (e.g. closing the file) waits for it instead of running concurrently.
+
+        Arguments:
+            func (Callable): blocking IO function.
+            args: function arguments.
+
+        Returns:
+            function result.
+        """
+        if self._pending_io:
+            # only unfinished if the previous call was cancelled
+            await asyncio.wait([self._pending_io])
+        self._pending_io = asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        return await asyncio.shield(self._pending_io)
+
+    def _open(self):
+        self._fd = os.open(self._filepath, FILE_OPEN_FLAGS, FILE_MODE)
+
+    def _close(self, unfinished: bool):
+        """Flush the file to disk, drop it from the page cache and close it.
+
+        Written images aren't read back, so keeping them cached only adds dirty page pressure
+        on big collections.
+
+        Arguments:
+            unfinished (bool): the file isn't written completely, remove it instead of flushing.
+        """
+        if self._fd < 0:
+            # the file wasn't opened
+            return
+        with ExitStack() as stack:
+            # callbacks run in reverse order: the file is closed before it is removed
+            if unfinished:
+                stack.callback(self._filepath.unlink, missing_ok=True)
+            stack.callback(os.close, self._fd)
+            if HAS_FADVISE and not unfinished:
+                os.fdatasync(self._fd)
+                os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+async def _run_concurrently(coros: list[Coroutine[Any, Any, None]]):
+    """Run coroutines concurrently, the rest of them are cancelled as soon as one fails.
+
+    Unlike bare `asyncio.gather`, failed downloads don't leave sibling workers writing files
+    in the background. The coroutines are cancelled only once, so a second cancellation
+    doesn't interrupt them removing their unfinished files.
+
+    Arguments:
+        coros (list[Coroutine]): coroutines to run.
+
+    Raises:
+        Exception: the first exception raised by the coroutines.
+        asyncio.CancelledError: if cancelled, the coroutines are cancelled too.
+    """
+    if len(coros) == 1:
+        # nothing to run concurrently, skip wrapping the coroutine into a task
+        await coros[0]
+        return
+
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        # cancelling gather has cancelled the tasks already, wait for them to finish cleanup
+        await asyncio.wait(tasks)
+        raise
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+        raise
+
+
 class HavenDownloader():
     """HavenDownloader provides a set of functions for downloading files from wallhvaen."""
 
-    def __init__(self, apikey: str | None = None, parallel_requests: int = 4):
+    def __init__(
+        self,
+        apikey: str | None = None,
+        parallel_requests: int = 4,
+        cache_dir: Path = cache.CACHE_DIR,
+    ):
         """Initialize HavenDownloader.
 
         Arguments:
             apikey (str): wallhaven API key.
             parallel_requests (int): maximum number of parallel requests.
+            cache_dir (Path): directory of the collection ids cache.
         """
         self.apikey = apikey
 
-        self._sem = asyncio.Semaphore(parallel_requests)
+        self._parallel_requests = parallel_requests
+        self._cache_dir = cache_dir
 
     async def download(
         self,
@@ -56,56 +356,110 @@ class HavenDownloader():
         if isinstance(dest_dir, str):
             dest_dir = Path(dest_dir)
 
-        async with httpx.AsyncClient() as http_client:
+        async with httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=self._parallel_requests,
+                max_keepalive_connections=self._parallel_requests,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=REQUEST_TIMEOUT,
+            headers={'Accept-Encoding': 'gzip, br'},
+        ) as http_client:
             file_data_list = await self._get_image_data(http_client, user_name, collection_name)
 
-            with Progress() as progress:
-                total_progress = progress.add_task(
-                    description='Total',
-                    total=sum(fdata.size for fdata in file_data_list),
-                )
-                tasks = [
-                    self._download_file(http_client, file_data, dest_dir, progress, total_progress)
-                    for file_data in file_data_list
-                ]
-                await asyncio.gather(*tasks)
+        connector = aiohttp.TCPConnector(limit=self._parallel_requests, ttl_dns_cache=DNS_CACHE_TTL)
+        timeout = aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT)
+        # an error page of the CDN must not be saved as an image
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, raise_for_status=True) as session:
+            if file_data_list:
+                # resolve the CDN host and open the first connection before downloads race for it,
+                # the response itself doesn't matter
+                resp = await session.head(file_data_list[0].url, raise_for_status=False)
+                resp.release()
+            await self._download_files(session, file_data_list, dest_dir)
+
+    async def _download_files(
+        self,
+        session: aiohttp.ClientSession,
+        file_data_list: list[FileData],
+        dest_dir: Path,
+    ):
+        """Download files concurrently, `parallel_requests` at a time, and show their progress.
+
+        Arguments:
+            session (ClientSession): HTTP session for file downloads.
+            file_data_list (list[FileData]): files to download.
+            dest_dir (Path): destination directory.
+        """
+        # all files are queued upfront, so a worker stops as soon as the queue is empty;
+        # the queue is never joined, `_run_concurrently` waits for the workers themselves
+        queue: asyncio.Queue[FileData] = asyncio.Queue()
+        for file_data in file_data_list:
+            queue.put_nowait(file_data)
+        workers_count = min(self._parallel_requests, len(file_data_list))
+
+        executor = ThreadPoolExecutor(max_workers=self._parallel_requests)
+        async with AsyncExitStack() as stack:
+            # `shutdown` waits for unfinished file IO, so it must not block the event loop
+            stack.push_async_callback(asyncio.to_thread, executor.shutdown)
+            progress = await stack.enter_async_context(_DownloadProgress(
+                total_size=sum(fdata.size for fdata in file_data_list),
+            ))
+            workers = [
+                self._download_worker(queue, session, executor, dest_dir, progress)
+                for _ in range(workers_count)
+            ]
+            await _run_concurrently(workers)
+
+    async def _download_worker(  # noqa: WPS211 Found too many arguments
+        self,
+        queue: asyncio.Queue[FileData],
+        session: aiohttp.ClientSession,
+        executor: ThreadPoolExecutor,
+        dest_dir: Path,
+        progress: _DownloadProgress,
+    ):
+        """Download files from the queue one by one until it is empty.
+
+        Arguments:
+            queue (asyncio.Queue[FileData]): files to download, shared by all workers.
+            session (ClientSession): HTTP session for file downloads.
+            executor (ThreadPoolExecutor): executor for blocking file IO.
+            dest_dir (Path): destination directory.
+            progress (_DownloadProgress): progress bars view.
+        """
+        while not queue.empty():
+            file_data = queue.get_nowait()
+            await self._download_file(session, executor, file_data, dest_dir, progress)
 
     async def _download_file(  # noqa: WPS211 Found too many arguments
         self,
-        http_client: httpx.AsyncClient,
+        session: aiohttp.ClientSession,
+        executor: ThreadPoolExecutor,
         file_data: FileData,
         dest_dir: Path,
-        progress: Progress,
-        total_progress: ProgressTaskID,
+        progress: _DownloadProgress,
     ):
         """Download a single file.
 
         Arguments:
-            http_client (AsyncClient): HTTP client.
+            session (ClientSession): HTTP session for file downloads.
+            executor (ThreadPoolExecutor): executor for blocking file IO, so it doesn't stall the event loop.
             file_data (FileData): file information.
             dest_dir (Path): destination directory.
-            progress (Progress): progress bars view.
-            total_progress (ProgressTaskID): total progress bar.
+            progress (_DownloadProgress): progress bars view.
         """
-        await self._sem.acquire()
-
-        task_progress = progress.add_task(file_data.name, total=file_data.size)
+        counter = progress.add_file(file_data.name, file_data.size)
         filepath = dest_dir / file_data.name
 
-        async with http_client.stream('GET', file_data.url, timeout=REQUEST_TIMEOUT) as resp:
-            with open(filepath.expanduser(), 'wb') as image_file:
+        async with session.get(file_data.url) as resp:
+            async with _FileWriter(executor, filepath.expanduser()) as file_writer:
+                async for image_data in resp.content.iter_chunked(CHUNK_SIZE):
+                    await file_writer.write(image_data)
+                    counter.pending += len(image_data)
 
-                async for image_data in resp.aiter_bytes():
-                    image_file.write(image_data)
-                    progress.advance(task_progress, len(image_data))
-                    progress.advance(total_progress, len(image_data))
-
-        progress.update(task_progress, description=f':white_check_mark: {file_data.name}')
-        # to show check mark on screen before task is removed
-        await asyncio.sleep(0.5)
-        progress.update(task_progress, visible=False)
-
-        self._sem.release()
+        progress.finish_file(counter, file_data.name)
 
     async def _get_image_data(
         self,
@@ -122,33 +476,65 @@ class HavenDownloader():
 
         Returns:
             list[FileData]: list of image data.
+        """
+        client = HavenClient(http_client, self.apikey)
+
+        collection = await self._get_collection_wallpappers(client, user_name, collection_name)
+        # local aliases skip global/attribute lookups for every image of a big collection
+        basename = os.path.basename
+        file_data_cls = FileData
+        return [
+            file_data_cls(
+                name=basename(image.path),
+                url=image.path,
+                size=image.file_size,
+            )
+            for image in collection
+        ]
+
+    async def _get_collection_wallpappers(
+        self,
+        client: HavenClient,
+        user_name: str,
+        collection_name: str,
+    ) -> list[entities.Wallpapper]:
+        """Get wallpapers of a collection by its name, the collection id is cached on disk.
+
+        If the cached collection can't be fetched (e.g. it was deleted), the cache is dropped
+        and the id is looked up again. A collection renamed after its id was cached is still
+        found by the old name until the cache expires.
+
+        Arguments:
+            client (HavenClient): wallhaven API client.
+            user_name (str): wallhaven user name.
+            collection_name (str): collection name.
+
+        Returns:
+            list[Wallpapper]: wallpapers of the collection.
 
         Raises:
             RuntimeError: if collection is not found.
         """
-        client = HavenClient(http_client, self.apikey)
+        collection_id = await asyncio.to_thread(cache.load_collection_id, self._cache_dir, user_name, collection_name)
+        if collection_id is not None:
+            with suppress(errors.ClientRequestError):
+                return await client.get_wallpapper_list(user_name, collection_id)
+            await asyncio.to_thread(cache.drop_collection_id, self._cache_dir, user_name, collection_name)
 
-        collections = cast(
-            list[dict[str, Any]],
-            await client.get_collections(user_name),
-        )
+        collections = await client.get_collections(user_name)
         collection_id = next(
             (
-                collection['id']
+                collection.id
                 for collection in collections
-                if collection['label'] == collection_name
+                if collection.label == collection_name
             ),
             None,
         )
         if not collection_id:
             raise RuntimeError(f'Collection "{collection_name}" not found')
 
-        collection = await client.get_wallpapper_list(user_name, collection_id)
-        return [
-            FileData(
-                name=cast(str, image['path']).rsplit('/', 1)[-1],
-                url=cast(str, image['path']),
-                size=cast(int, image['file_size']),
-            )
-            for image in collection
-        ]
+        wallpapers, _ = await asyncio.gather(
+            client.get_wallpapper_list(user_name, collection_id),
+            asyncio.to_thread(cache.save_collection_id, self._cache_dir, user_name, collection_name, collection_id),
+        )
+        return wallpapers
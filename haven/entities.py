@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import Literal, TypedDict
+from typing import Literal
+
+import msgspec
 
 PurityType = Literal['sfw', 'sketchy', 'nsfw']
 
 
-class Collection(TypedDict):
+class Collection(msgspec.Struct):
     """Collection entity representation."""
 
     id: int
@@ -15,7 +17,7 @@ class Collection(TypedDict):
     count: int
 
 
-class Wallpapper(TypedDict):
+class Wallpapper(msgspec.Struct):
     """Wallpaper data."""
 
     id: str
@@ -38,7 +40,7 @@ class Wallpapper(TypedDict):
     thumbs: Thumbs
 
 
-class Thumbs(TypedDict):
+class Thumbs(msgspec.Struct):
     """Thumbnails url of an wallpaper."""
 
     small: str
@@ -46,7 +48,7 @@ class Thumbs(TypedDict):
     large: str
 
 
-class UserSettings(TypedDict):
+class UserSettings(msgspec.Struct):
     """User settings."""
 
     thumb_size: str
@@ -1,6 +1,6 @@
 import enum
 from dataclasses import dataclass
-from typing import Literal
+from typing import Final, Literal
 
 
 @enum.unique
@@ -21,6 +21,10 @@ class PurityFlags(enum.IntFlag):
     SFW = enum.auto()
 
 
+#: 3-bit binary strings (like 010) of all CategoryFlags and PurityFlags values, indexed by a flags value.
+FLAG_BITS: Final[tuple[str, ...]] = tuple(f'{flags:03b}' for flags in range(8))
+
+
 @enum.unique
 class TopRange(str, enum.Enum):  # noqa: WPS600: Found subclassing a builtin
     ONE_DAY = '1d'
@@ -42,7 +46,7 @@ class SortingValue(str, enum.Enum):  # noqa: WPS600: Found subclassing a builtin
     TOPLIST = 'toplist'
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SearchParams:
     """Image search parameters."""
 
@@ -0,0 +1,126 @@
+import re
+from types import MappingProxyType
+
+import httpx
+import msgspec
+import pytest
+
+from haven import errors
+from haven.client import HavenClient
+from haven.entities import Collection
+from haven.search_filters import CategoryFlags, PurityFlags, SearchParams, SortingValue, TopRange
+
+TEST_USER = 'a b/c'
+TEST_COLLECTION = 42
+TEST_COLLECTION_DATA = MappingProxyType({
+    'id': 1,
+    'label': 'Default',
+    'views': 2,
+    'public': 1,
+    'count': 3,
+})
+TEST_WALLPAPER = MappingProxyType({
+    'id': '94x38z',
+    'url': 'https://wallhaven.cc/w/94x38z',
+    'short_url': 'https://whvn.cc/94x38z',
+    'views': 6,
+    'favorites': 0,
+    'source': '',
+    'purity': 'sfw',
+    'category': 'anime',
+    'dimension_x': 6742,
+    'dimension_y': 3534,
+    'resolution': '6742x3534',
+    'ratio': '1.91',
+    'file_size': 5070446,
+    'file_type': 'image/jpeg',
+    'created_at': '2018-10-31 01:23:10',
+    'colors': ['#000000', '#abbcda'],
+    'path': 'https://w.wallhaven.cc/full/94/wallhaven-94x38z.jpg',
+    'thumbs': {
+        'large': 'https://th.wallhaven.cc/lg/94/94x38z.jpg',
+        'original': 'https://th.wallhaven.cc/orig/94/94x38z.jpg',
+        'small': 'https://th.wallhaven.cc/small/94/94x38z.jpg',
+    },
+})
+TEST_LAST_PAGE = 5
+
+
+def _answer_with_url(request: httpx.Request) -> httpx.Response:
+    # fails every request with the requested URL as the error message, so tests can check it
+    return httpx.Response(httpx.codes.NOT_FOUND, json={'error': str(request.url)})
+
+
+def _answer_with_page(request: httpx.Request) -> httpx.Response:
+    # every collection page has a single wallpaper with the page number as its id
+    page = int(request.url.params.get('page', 1))
+    wallpaper = {**TEST_WALLPAPER, 'id': f'page{page}'}
+    meta = {'current_page': page, 'last_page': TEST_LAST_PAGE}
+    return httpx.Response(httpx.codes.OK, json={'data': [wallpaper], 'meta': meta})
+
+
+async def test_build_query_dict(client: HavenClient):
+    filters = SearchParams(
+        tags=['cars'],
+        exclude_tags=['girl'],
+        types=['png'],
+        categories=CategoryFlags.GENERAL | CategoryFlags.PEOPLE,
+        purity=PurityFlags.SFW,
+        sorting=SortingValue.RANDOM,
+        top_range=TopRange.HALF_YEAR,
+        colors=['000000', '424153'],
+    )
+    query_params = client._build_query_dict(filters)  # noqa: WPS437 Found protected attribute usage
+    assert query_params == {
+        'q': 'cars -girl type:png',
+        'categories': '101',
+        'purity': '100',
+        'sorting': 'random',
+        'topRange': '6M',
+        'colors': ['000000', '424153'],
+    }
+    assert not client._build_query_dict(SearchParams())  # noqa: WPS437
+
+
+@pytest.mark.parametrize('apihost', ['https://wallhaven.cc', 'https://wallhaven.cc/'])
+async def test_api_urls(apihost: str):
+    transport = httpx.MockTransport(_answer_with_url)
+    async with httpx.AsyncClient(transport=transport) as http_client:
+        client = HavenClient(http_client, apihost=apihost)
+
+        url = re.escape('https://wallhaven.cc/api/v1/collections/a%20b%2Fc')  # noqa: WPS323 it's URL quoting
+        with pytest.raises(errors.ClientRequestError, match=f'^{url}$'):
+            await client.get_collections(TEST_USER)
+
+        url = re.escape('https://wallhaven.cc/api/v1/collections/a%20b%2Fc/42')  # noqa: WPS323
+        with pytest.raises(errors.ClientRequestError, match=f'^{url}$'):
+            await client.get_wallpapper_list(TEST_USER, TEST_COLLECTION)
+
+
+@pytest.mark.parametrize('body,data_type,expected', [
+    ({'data': [dict(TEST_COLLECTION_DATA)]}, list[Collection], [Collection(**TEST_COLLECTION_DATA)]),
+    # a response without `data` (or with null `data`) is the data itself
+    (dict(TEST_COLLECTION_DATA), Collection, Collection(**TEST_COLLECTION_DATA)),
+    ({**TEST_COLLECTION_DATA, 'data': None}, Collection, Collection(**TEST_COLLECTION_DATA)),
+])
+async def test_get_resp_data(client: HavenClient, body: dict, data_type: type, expected: object):
+    resp = httpx.Response(httpx.codes.OK, json=body)
+    assert client._get_resp_data(resp, msgspec.json.Decoder(data_type)) == expected  # noqa: WPS437
+
+
+@pytest.mark.parametrize('resp,message', [
+    (httpx.Response(httpx.codes.UNAUTHORIZED, json={'error': 'Nothing here'}), 'Nothing here'),
+    (httpx.Response(httpx.codes.TOO_MANY_REQUESTS, text='<html>Too Many Requests</html>'), '429 Too Many Requests'),
+    (httpx.Response(httpx.codes.INTERNAL_SERVER_ERROR, json={}), '500 Internal Server Error'),
+    (httpx.Response(httpx.codes.OK, text='Not a JSON'), '200 OK'),
+])
+async def test_get_resp_data_errors(client: HavenClient, resp: httpx.Response, message: str):
+    with pytest.raises(errors.ClientRequestError, match=message):
+        client._get_resp_data(resp, msgspec.json.Decoder(list[Collection]))  # noqa: WPS437
+
+
+async def test_get_wallpappers_list_pages():
+    async with httpx.AsyncClient(transport=httpx.MockTransport(_answer_with_page)) as http_client:
+        wallpappers = await HavenClient(http_client).get_wallpapper_list(TEST_USER, TEST_COLLECTION)
+    pages = range(1, TEST_LAST_PAGE + 1)
+    assert [wallpapper.id for wallpapper in wallpappers] == [f'page{page}' for page in pages]
@@ -0,0 +1,82 @@
+import functools
+import os
+import time
+from pathlib import Path
+from types import MappingProxyType
+
+import httpx
+
+from haven import cache
+from haven.client import HavenClient
+from haven.downloader import HavenDownloader
+
+TEST_USER = 'deterok'
+TEST_COLLECTION_NAME = 'Default'
+TEST_COLLECTION = 42
+TEST_DELETED_COLLECTION = 13
+TEST_COLLECTION_DATA = MappingProxyType({
+    'id': TEST_COLLECTION,
+    'label': TEST_COLLECTION_NAME,
+    'views': 0,
+    'public': 1,
+    'count': 0,
+})
+
+COLLECTIONS_PATH = f'/api/v1/collections/{TEST_USER}'
+COLLECTION_PATH = f'{COLLECTIONS_PATH}/{TEST_COLLECTION}'
+DELETED_COLLECTION_PATH = f'{COLLECTIONS_PATH}/{TEST_DELETED_COLLECTION}'
+
+
+def _answer_collection(requested_paths: list[str], request: httpx.Request) -> httpx.Response:
+    # the user has a single empty collection, requested paths are logged to check the cache usage
+    requested_paths.append(request.url.path)
+    if request.url.path == COLLECTIONS_PATH:
+        return httpx.Response(httpx.codes.OK, json={'data': [dict(TEST_COLLECTION_DATA)]})
+    if request.url.path == COLLECTION_PATH:
+        return httpx.Response(httpx.codes.OK, json={'data': []})
+    return httpx.Response(httpx.codes.NOT_FOUND, json={'error': 'Nothing here'})
+
+
+async def _get_collection_wallpappers(cache_dir: Path) -> list[str]:
+    requested_paths: list[str] = []
+    transport = httpx.MockTransport(functools.partial(_answer_collection, requested_paths))
+    async with httpx.AsyncClient(transport=transport) as http_client:
+        downloader = HavenDownloader(cache_dir=cache_dir)
+        await downloader._get_collection_wallpappers(  # noqa: WPS437 Found protected attribute usage
+            HavenClient(http_client), TEST_USER, TEST_COLLECTION_NAME,
+        )
+    return requested_paths
+
+
+def _cache_collection_id(cache_dir: Path, collection_id: int | str) -> Path:
+    cache.save_collection_id(cache_dir, TEST_USER, TEST_COLLECTION_NAME, collection_id)
+    return next(cache_dir.iterdir())
+
+
+async def test_collection_id_cache_hit(tmp_path: Path):
+    assert await _get_collection_wallpappers(tmp_path) == [COLLECTIONS_PATH, COLLECTION_PATH]
+    assert await _get_collection_wallpappers(tmp_path) == [COLLECTION_PATH]
+
+
+async def test_collection_id_cache_expired(tmp_path: Path):
+    cache_path = _cache_collection_id(tmp_path, TEST_DELETED_COLLECTION)
+    expired_at = time.time() - cache.COLLECTION_ID_CACHE_TTL - 1
+    os.utime(cache_path, (expired_at, expired_at))
+
+    assert await _get_collection_wallpappers(tmp_path) == [COLLECTIONS_PATH, COLLECTION_PATH]
+    assert cache.load_collection_id(tmp_path, TEST_USER, TEST_COLLECTION_NAME) == TEST_COLLECTION
+
+
+async def test_collection_id_cache_garbage(tmp_path: Path):
+    _cache_collection_id(tmp_path, 'garbage')
+
+    assert await _get_collection_wallpappers(tmp_path) == [COLLECTIONS_PATH, COLLECTION_PATH]
+    assert cache.load_collection_id(tmp_path, TEST_USER, TEST_COLLECTION_NAME) == TEST_COLLECTION
+
+
+async def test_collection_id_cache_deleted_collection(tmp_path: Path):
+    _cache_collection_id(tmp_path, TEST_DELETED_COLLECTION)
+
+    requested_paths = await _get_collection_wallpappers(tmp_path)
+    assert requested_paths == [DELETED_COLLECTION_PATH, COLLECTIONS_PATH, COLLECTION_PATH]
+    assert cache.load_collection_id(tmp_path, TEST_USER, TEST_COLLECTION_NAME) == TEST_COLLECTION
@@ -0,0 +1,129 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+from aiohttp import ClientError, hdrs, web
+
+from haven.downloader import (  # noqa: WPS450 Found protected object import
+    CHUNK_SIZE,
+    FileData,
+    HavenDownloader,
+    _DownloadProgress,
+    _write_all,
+)
+
+IMAGE_SIZE = CHUNK_SIZE * 2 + 1
+IMAGE_DATA = b'image data'
+PARALLEL_REQUESTS = 3
+#: Sent before a broken or a stalled response stops, so the file is partially written.
+PARTIAL_SIZE = 1024
+#: How long a download may take, stalled responses never finish within it.
+DOWNLOAD_TIMEOUT = 5
+
+
+async def _serve_image(request: web.Request) -> web.StreamResponse:
+    # `broken*` images are cut off, `stalled*` ones hang, `missing*` ones aren't found
+    name = request.match_info['name']
+    if request.method == hdrs.METH_HEAD:
+        return web.Response()
+    if name.startswith('missing'):
+        raise web.HTTPNotFound()
+
+    response = web.StreamResponse(headers={hdrs.CONTENT_LENGTH: str(IMAGE_SIZE)})
+    await response.prepare(request)
+    if not name.startswith(('broken', 'stalled')):
+        await response.write(b'x' * IMAGE_SIZE)
+        return response
+
+    await response.write(b'x' * PARTIAL_SIZE)
+    if name.startswith('broken'):
+        # let the other downloads start writing their files
+        await asyncio.sleep(0.1)
+        request.transport.close()
+    else:
+        await asyncio.sleep(DOWNLOAD_TIMEOUT * 2)
+    return response
+
+
+@pytest.fixture(name='image_server')
+async def fixture_image_server() -> AsyncIterator[str]:
+    app = web.Application()
+    app.router.add_get('/{name}', _serve_image)
+    runner = web.AppRunner(app, handler_cancellation=True)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    host, port = runner.addresses[0][:2]
+    yield f'http://{host}:{port}'
+    await runner.cleanup()
+
+
+async def _download(monkeypatch: pytest.MonkeyPatch, image_server: str, dest_dir: Path, names: list[str]):
+    file_data_list = [
+        FileData(name=name, size=IMAGE_SIZE, url=f'{image_server}/{name}')
+        for name in names
+    ]
+    downloader = HavenDownloader(parallel_requests=PARALLEL_REQUESTS)
+    # the collection is served by the image server instead of the API
+    get_image_data = lambda *args: asyncio.sleep(0, result=file_data_list)  # noqa: E731
+    monkeypatch.setattr(downloader, '_get_image_data', get_image_data)
+    await asyncio.wait_for(downloader.download('user', 'collection', dest_dir), DOWNLOAD_TIMEOUT)
+
+
+@pytest.mark.parametrize('files_count', [0, 1, PARALLEL_REQUESTS * 2 + 1])
+async def test_download(monkeypatch: pytest.MonkeyPatch, image_server: str, tmp_path: Path, files_count: int):
+    names = [f'{index}.jpg' for index in range(files_count)]
+    await _download(monkeypatch, image_server, tmp_path, names)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names)
+    assert {path.stat().st_size for path in tmp_path.iterdir()} <= {IMAGE_SIZE}
+
+
+@pytest.mark.parametrize('failed_name', ['broken.jpg', 'missing.jpg'])
+async def test_download_failure(monkeypatch: pytest.MonkeyPatch, image_server: str, tmp_path: Path, failed_name: str):
+    # the stalled downloads never finish unless they are cancelled after the failure
+    names = ['stalled1.jpg', 'stalled2.jpg', failed_name]
+    with pytest.raises(ClientError):
+        await _download(monkeypatch, image_server, tmp_path, names)
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_write_all_short_write(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    os_write = os.write
+    # a single os.write call writes 3 bytes at most
+    short_write = lambda fd, chunk: os_write(fd, chunk[:3])  # noqa: E731
+    monkeypatch.setattr(os, 'write', short_write)
+    filepath = tmp_path / 'image.jpg'
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT)
+    _write_all(fd, IMAGE_DATA)
+    os.close(fd)
+
+    assert filepath.read_bytes() == IMAGE_DATA
+
+
+async def test_download_progress():
+    async with _DownloadProgress(total_size=IMAGE_SIZE * 2) as progress:
+        rich_progress = progress._progress  # noqa: WPS437 Found protected attribute usage
+        first_counter = progress.add_file('first.jpg', IMAGE_SIZE)
+        first_counter.pending = IMAGE_SIZE
+        second_counter = progress.add_file('second.jpg', IMAGE_SIZE)
+        second_counter.pending = PARTIAL_SIZE
+
+        # pending bytes are moved to the progress bars
+        assert progress._flush(now=0) == [first_counter, second_counter]  # noqa: WPS437
+        completed = [task.completed for task in rich_progress.tasks]
+        assert completed == [IMAGE_SIZE + PARTIAL_SIZE, IMAGE_SIZE, PARTIAL_SIZE]
+
+        # a finished file is hidden after a while
+        progress.finish_file(first_counter, 'first.jpg')
+        assert progress._flush(now=first_counter.hide_at) == [second_counter]  # noqa: WPS437
+        assert [task.visible for task in rich_progress.tasks] == [True, False, True]
+
+        second_counter.pending = IMAGE_SIZE - PARTIAL_SIZE
+
+    # everything is flushed and hidden on exit
+    final_state = [(task.completed, task.visible) for task in rich_progress.tasks]
+    hidden_file_state = (IMAGE_SIZE, False)
+    assert final_state == [(IMAGE_SIZE * 2, True), hidden_file_state, hidden_file_state]